@@ -1,17 +1,24 @@
 from typing import Iterator
-import re
+from aho_corasick import AhoCorasick
 
 use_test = False
 greek_uppercase = list("ΑΒΓΔΕΖΗΘΙΚΛΜΝΞΟΠΡΣΤΥΦΧΨΩ")
 greek_lowercase = list("αβγδεζηθικλμνξοπρστυφχψω")
 sigma = "\N{GREEK SMALL LETTER SIGMA}"
 final_sigma = "\N{GREEK SMALL LETTER FINAL SIGMA}"
-words = re.compile(r"\w+")
+greek_indexes = {
+	char: i
+	for alphabet in [greek_uppercase, greek_lowercase]
+	for (i, char) in enumerate(alphabet)
+}
+word_boundary = None
+
+ShiftSymbol = tuple[bool, int | None] | str | None
 
 
 def run(lines: Iterator[str]):
 	targets = [
-		shift_greek(word, 0) for word in [
+		word.replace(final_sigma, sigma) for word in [
 			"Οδυσσευς",
 			"Οδυσσεως",
 			"Οδυσσει",
@@ -19,36 +26,45 @@ def run(lines: Iterator[str]):
 			"Οδυσσευ"
 		]
 	]
+	matcher = shift_matcher(targets)
 	print(sum(
-		find_shift(line, targets) or 0
+		find_shift(line, matcher) or 0
 		for line in lines
 	))
 
-def find_shift(text: str, targets: list[str]) -> int | None:
-	for degree in range(len(greek_uppercase)):
-		shifted = shift_greek(text, degree)
-		shifted_words = words.findall(shifted)
-		for target in targets:
-			if target in shifted_words:
-				return degree
-	return None
-
-def shift_greek(text: str, degree: int) -> str:
-	shifted_text = "".join(
-		shift_letter(
-			[greek_uppercase, greek_lowercase],
-			sigma if char == final_sigma else char,
-			degree
-		)
-		for char in text
+def find_shift(text: str, matcher: AhoCorasick[ShiftSymbol, str]) -> int | None:
+	return min((degree for (degree, _, _) in find_targets(text, matcher)), default=None)
+
+def find_targets(text: str, matcher: AhoCorasick[ShiftSymbol, str]) -> Iterator[tuple[int, str, int]]:
+	text = text.replace(final_sigma, sigma)
+	for (position, target) in matcher.search(shift_invariant(text)):
+		# Patterns begin with a word boundary, and the symbols are offset by
+		# the boundary added before the text, so the position is the word start
+		yield (shift_between(text[position], target[0]), target, position)
+
+def shift_matcher(targets: list[str]) -> AhoCorasick[ShiftSymbol, str]:
+	return AhoCorasick(
+		(target, list(shift_invariant(target)))
+		for target in targets
 	)
-	return shifted_text
 
-def shift_letter(alphabets: list[list[str]], char: str, degree: int) -> str:
-	for alphabet in alphabets:
-		if char in alphabet:
-			return alphabet[(alphabet.index(char) + degree) % len(alphabet)]
-	return char
+def shift_invariant(text: str) -> Iterator[ShiftSymbol]:
+	yield word_boundary
+	previous = None
+	for char in text:
+		if not (char.isalnum() or char == "_"):
+			yield word_boundary
+			previous = None
+		elif (index := greek_indexes.get(char)) is not None:
+			yield (char.isupper(), None if previous is None else (index - previous) % len(greek_lowercase))
+			previous = index
+		else:
+			yield char
+			previous = None
+	yield word_boundary
+
+def shift_between(source: str, target: str) -> int:
+	return (greek_indexes[target] - greek_indexes[source]) % len(greek_lowercase)
 
 #region Common code
 if __name__ == "__main__":
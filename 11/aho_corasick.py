@@ -0,0 +1,47 @@
+from collections import deque
+from collections.abc import Hashable, Iterable, Sequence
+from typing import Generic, Iterator, TypeVar
+
+Symbol = TypeVar("Symbol", bound=Hashable)
+Key = TypeVar("Key")
+
+class AhoCorasick(Generic[Symbol, Key]):
+	def __init__(self, patterns: Iterable[tuple[Key, Sequence[Symbol]]]):
+		self.__goto: list[dict[Symbol, int]] = [{}]
+		self.__fail: list[int] = [0]
+		self.__output: list[list[tuple[Key, int]]] = [[]]
+		for (key, pattern) in patterns:
+			self.__add(key, pattern)
+		self.__link()
+
+	def __add(self, key: Key, pattern: Sequence[Symbol]):
+		state = 0
+		for symbol in pattern:
+			if symbol not in self.__goto[state]:
+				self.__goto.append({})
+				self.__fail.append(0)
+				self.__output.append([])
+				self.__goto[state][symbol] = len(self.__goto) - 1
+			state = self.__goto[state][symbol]
+		self.__output[state].append((key, len(pattern)))
+
+	def __link(self):
+		queue = deque(self.__goto[0].values())
+		while len(queue) > 0:
+			state = queue.popleft()
+			for (symbol, next_state) in self.__goto[state].items():
+				queue.append(next_state)
+				fallback = self.__fail[state]
+				while fallback != 0 and symbol not in self.__goto[fallback]:
+					fallback = self.__fail[fallback]
+				self.__fail[next_state] = self.__goto[fallback].get(symbol, 0)
+				self.__output[next_state] = self.__output[next_state] + self.__output[self.__fail[next_state]]
+
+	def search(self, text: Iterable[Symbol]) -> Iterator[tuple[int, Key]]:
+		state = 0
+		for (i, symbol) in enumerate(text):
+			while state != 0 and symbol not in self.__goto[state]:
+				state = self.__fail[state]
+			state = self.__goto[state].get(symbol, 0)
+			for (key, length) in self.__output[state]:
+				yield (i - length + 1, key)
@@ -3,14 +3,21 @@ from collections.abc import Callable
 import re
 import unicodedata
 import functools
-import itertools
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
 
 use_test = False
+use_processes = False
 
 PhonebookEntry = tuple[str, str, str]
-LettersSplitter = Callable[[str], Iterator[str]]
-LettersComparator = Callable[[str, str], int]
-NamePreprocessor = Callable[[str, str], tuple[str, str]]
+# Each combined character of a name, paired with its diacritic-stripped form
+DecomposedName = tuple[tuple[str, str], ...]
+DecomposedEntry = tuple[DecomposedName, DecomposedName, str]
+LettersSplitter = Callable[[DecomposedName], Iterator[str]]
+LetterKey = Callable[[str], int]
+NameKey = tuple[tuple[int, ...], tuple[int, ...]]
+NamePreprocessor = Callable[[DecomposedName, DecomposedName], tuple[DecomposedName, DecomposedName]]
 
 phonebook_line = re.compile(r"(?P<last>[^,]*), (?P<first>[^:]*): (?P<phone>\d+)")
 ligatures = {
@@ -21,19 +28,47 @@ ligatures = {
 	"ẞ": "Ss",
 	"ß": "ss"
 }
+alphabet_en = {letter: i for (i, letter) in enumerate("ABCDEFGHIJKLMNOPQRSTUVWXYZ")}
+alphabet_sv = {letter: i for (i, letter) in enumerate("ABCDEFGHIJKLMNOPQRSTUVWXYZÅÄÖ")}
+alphabet_nl = alphabet_en
+locales = ["en", "sv", "nl"]
 
 def run(lines: Iterator[str]):
-	phonebook = [parse_line(line) for line in lines]
-	sorted_en = sorted(phonebook, key=phonebook_key(letters_en, compare_letters_en))
-	sorted_sv = sorted(phonebook, key=phonebook_key(letters_sv, compare_letters_sv))
-	sorted_nl = sorted(phonebook, key=phonebook_key(letters_nl, compare_letters_nl, preprocess_names_nl))
-	print(
-		int(phone_number(mid_value(sorted_en)))
-		* int(phone_number(mid_value(sorted_sv)))
-		* int(phone_number(mid_value(sorted_nl)))
-	)
-
-def phone_number(entry: PhonebookEntry) -> str:
+	phonebook = [decompose_entry(parse_line(line)) for line in lines]
+	middles = locale_mid_values(phonebook)
+	print(math.prod(int(phone_number(entry)) for entry in middles))
+
+def locale_mid_values(phonebook: list[DecomposedEntry]) -> list[DecomposedEntry]:
+	if not use_processes:
+		return [locale_mid_value(phonebook, locale) for locale in locales]
+	# The phonebook is sent to each worker once, rather than with every locale
+	with ProcessPoolExecutor(
+		max_workers=len(locales),
+		initializer=set_worker_phonebook,
+		initargs=(phonebook,)
+	) as executor:
+		return list(executor.map(worker_locale_mid_value, locales))
+
+def locale_mid_value(phonebook: list[DecomposedEntry], locale: str) -> DecomposedEntry:
+	return mid_value(phonebook, locale_key(locale))
+
+worker_phonebook: list[DecomposedEntry] | None = None
+
+def set_worker_phonebook(phonebook: list[DecomposedEntry]):
+	global worker_phonebook
+	worker_phonebook = phonebook
+
+def worker_locale_mid_value(locale: str) -> DecomposedEntry:
+	return locale_mid_value(worker_phonebook, locale)
+
+def locale_key(locale: str) -> Callable[[DecomposedEntry], NameKey]:
+	match locale:
+		case "en": return phonebook_key(letters_en, letter_key_en)
+		case "sv": return phonebook_key(letters_sv, letter_key_sv)
+		case "nl": return phonebook_key(letters_nl, letter_key_nl, preprocess_names_nl)
+		case _: raise ValueError(f"Unknown locale: {locale}")
+
+def phone_number(entry: PhonebookEntry | DecomposedEntry) -> str:
 	(_, _, number) = entry
 	return number
 
@@ -47,38 +82,34 @@ def parse_line(line: str) -> PhonebookEntry:
 
 def phonebook_key(
 		letters_splitter: LettersSplitter,
-		letters_comparator: LettersComparator,
+		letter_key: LetterKey,
 		preprocess_name: NamePreprocessor = lambda last, first: (last, first)
-	):
-	def comp(entry1: PhonebookEntry, entry2: PhonebookEntry) -> int:
-		(entry1_last, entry1_first, _) = entry1
-		(entry2_last, entry2_first, _) = entry2
-		(entry1_last, entry1_first) = preprocess_name(entry1_last, entry1_first)
-		(entry2_last, entry2_first) = preprocess_name(entry2_last, entry2_first)
+	) -> Callable[[DecomposedEntry], NameKey]:
+	def key(entry: DecomposedEntry) -> NameKey:
+		(last, first, _) = entry
+		(last, first) = preprocess_name(last, first)
 		return (
-			comp_text(entry1_last, entry2_last, letters_splitter, letters_comparator)
-			or comp_text(entry1_first, entry2_first, letters_splitter, letters_comparator)
+			text_key(last, letters_splitter, letter_key),
+			text_key(first, letters_splitter, letter_key)
 		)
 
-	return functools.cmp_to_key(comp)
-
-def comp_text(text1: str, text2: str, letters_splitter: LettersSplitter, letters_comparator: LettersComparator) -> int:
-		for (letter1, letter2) in zip(
-			extend_iterator(letters_splitter(text1)),
-			extend_iterator(letters_splitter(text2)),
-		):
-			if letter1 is None:
-				return -1 if letter2 is not None else 0
-			if letter2 is None:
-				return 1
-			comp_result = letters_comparator(letter1, letter2)
-			if comp_result != 0:
-				return comp_result
+	return key
+
+def text_key(name: DecomposedName, letters_splitter: LettersSplitter, letter_key: LetterKey) -> tuple[int, ...]:
+	return tuple(letter_key(letter) for letter in letters_splitter(name))
+
+def decompose_entry(entry: PhonebookEntry) -> DecomposedEntry:
+	(last, first, phone) = entry
+	return (decompose(last), decompose(first), phone)
+
+def decompose(text: str) -> DecomposedName:
+	return tuple(
+		(char, strip_diacritics(char))
+		for char in combined_characters(text)
+	)
 
 T = TypeVar("T")
-def extend_iterator(iter: Iterator[T]) -> Iterator[T | None]:
-	yield from iter
-	yield from itertools.repeat(None)
+K = TypeVar("K")
 
 def combined_characters(text: str) -> Iterator[str]:
 	current = []
@@ -90,9 +121,8 @@ def combined_characters(text: str) -> Iterator[str]:
 		current.append(char)
 	yield unicodedata.normalize("NFC", "".join(current))
 
-def letters_en(text: str) -> Iterator[str]:
-	for char in combined_characters(text):
-		stripped = strip_diacritics(char)
+def letters_en(name: DecomposedName) -> Iterator[str]:
+	for (char, stripped) in name:
 		if stripped in ligatures:
 			yield from ligatures[stripped]
 		elif is_latin_letter_az(stripped):
@@ -100,18 +130,11 @@ def letters_en(text: str) -> Iterator[str]:
 		elif char.isalpha():
 			raise ValueError(f"Unhandled English letter: {char}")
 
-def compare_letters_en(letter1: str, letter2: str) -> int:
-	return (
-		letter_index_en(letter1.upper())
-		- letter_index_en(letter2.upper())
-	)
-
-def letter_index_en(letter: str) -> int:
-	return "ABCDEFGHIJKLMNOPQRSTUVWXYZ".index(letter)
+def letter_key_en(letter: str) -> int:
+	return alphabet_en[letter.upper()]
 
-def letters_sv(text: str) -> Iterator[str]:
-	for char in combined_characters(text):
-		stripped = strip_diacritics(char)
+def letters_sv(name: DecomposedName) -> Iterator[str]:
+	for (char, stripped) in name:
 		if char in ["Å", "å", "Ä", "ä", "Ö", "ö", "Æ", "æ", "Ø", "ø"]:
 			yield char
 		elif stripped in ligatures:
@@ -121,14 +144,8 @@ def letters_sv(text: str) -> Iterator[str]:
 		elif char.isalpha():
 			raise ValueError(f"Unhandled Swedish letter: {char}")
 
-def compare_letters_sv(letter1: str, letter2: str) -> int:
-	return (
-		letter_index_sv(normalize_letter_sv(letter1))
-		- letter_index_sv(normalize_letter_sv(letter2))
-	)
-
-def letter_index_sv(letter: str) -> int:
-	return "ABCDEFGHIJKLMNOPQRSTUVWXYZÅÄÖ".index(letter)
+def letter_key_sv(letter: str) -> int:
+	return alphabet_sv[normalize_letter_sv(letter)]
 
 def normalize_letter_sv(letter: str) -> str:
 	match letter:
@@ -136,14 +153,12 @@ def normalize_letter_sv(letter: str) -> str:
 		case "Ø" | "ø": return "Ö"
 		case _: return letter.upper()
 
-def letters_nl(text: str) -> Iterator[str]:
-	combined = list(combined_characters(text))
+def letters_nl(name: DecomposedName) -> Iterator[str]:
 	index = 0
-	while index < len(combined):
-		char = combined[index]
-		char2 = "".join(combined[index:(index + 2)])
+	while index < len(name):
+		(char, stripped) = name[index]
+		char2 = "".join(char for (char, _) in name[index:(index + 2)])
 		index += 1
-		stripped = strip_diacritics(char)
 		if char2 == "IJ" or char2 == "ij":
 			yield char2
 			index += 1
@@ -154,32 +169,24 @@ def letters_nl(text: str) -> Iterator[str]:
 		elif char.isalpha():
 			raise ValueError(f"Unhandled English letter: {char}")
 
-def compare_letters_nl(letter1: str, letter2: str) -> int:
-	return (
-		letter_index_nl(normalize_letter_nl(letter1))
-		- letter_index_nl(normalize_letter_nl(letter2))
-	)
-
-def letter_index_nl(letter: str) -> int:
-	return "ABCDEFGHIJKLMNOPQRSTUVWXYZ".index(letter)
-
-def compare_letters_nl(letter1: str, letter2: str) -> int:
-	return ord(normalize_letter_nl(letter1)) - ord(normalize_letter_nl(letter2))
+def letter_key_nl(letter: str) -> int:
+	return alphabet_nl[normalize_letter_nl(letter)]
 
 def normalize_letter_nl(letter: str) -> str:
 	match letter:
 		case "IJ" | "ij": return "Y"
 		case _: return letter.upper()
 
-def preprocess_names_nl(last: str, first: str) -> tuple[str, str]:
+def preprocess_names_nl(last: DecomposedName, first: DecomposedName) -> tuple[DecomposedName, DecomposedName]:
 	return (remove_prefix(last), first)
 
-def remove_prefix(name: str) -> str:
-	for (i, char) in enumerate(name):
+def remove_prefix(name: DecomposedName) -> DecomposedName:
+	for (i, (char, _)) in enumerate(name):
 		if char.isupper():
 			return name[i:]
 	return name
 
+@functools.cache
 def strip_diacritics(char: str) -> str:
 	norm = unicodedata.normalize("NFKD", char)
 	stripped = "".join(
@@ -203,11 +210,33 @@ def is_latin_letter_az(char: str) -> bool:
 		)
 	)
 
-def mid_value(arr: list[T]) -> T:
+def mid_value(arr: list[T], key: Callable[[T], K]) -> T:
 	count = len(arr)
 	if count % 2 == 0:
 		raise Exception("No middle element")
-	return arr[count // 2]
+	return nth_value(arr, count // 2, key)
+
+def percentile_value(arr: list[T], percentile: float, key: Callable[[T], K]) -> T:
+	if not 0 <= percentile <= 100:
+		raise ValueError(f"Percentile {percentile} is out of range")
+	return nth_value(arr, round(percentile / 100 * (len(arr) - 1)), key)
+
+def nth_value(arr: list[T], n: int, key: Callable[[T], K]) -> T:
+	if not 0 <= n < len(arr):
+		raise IndexError(f"Index {n} is out of range")
+	# The original index breaks ties, matching the stable order of sorted()
+	candidates = [(key(value), i) for (i, value) in enumerate(arr)]
+	while True:
+		pivot = random.choice(candidates)
+		lower = [candidate for candidate in candidates if candidate < pivot]
+		if n < len(lower):
+			candidates = lower
+		elif n == len(lower):
+			(_, index) = pivot
+			return arr[index]
+		else:
+			n -= len(lower) + 1
+			candidates = [candidate for candidate in candidates if candidate > pivot]
 
 #region Common code
 if __name__ == "__main__":
@@ -1,5 +1,7 @@
 from typing import Iterator
 import unicodedata
+import codecs
+import functools
 
 use_test = False
 encodings = [
@@ -17,45 +19,77 @@ def run(lines: Iterator[str]):
 	
 
 def decode_word(encoded: bytes) -> str:
-	results: set[str] = set()
-	for encoding in encodings:
+	for encoding in likely_encodings(encoded):
 		try:
 			decoding = encoded.decode(encoding)
-			if is_latin_word(decoding):
-				results.add(decoding)
 		except UnicodeDecodeError:
-			pass
-	if len(results) != 1:
-		print(f"{len(results)} possibilities for {encoded}: {results}")
-	return results.pop()
+			continue
+		if is_latin_word(decoding):
+			return decoding
+	raise ValueError(f"No possible decoding for {encoded}")
+
+def likely_encodings(encoded: bytes) -> list[str]:
+	if encoded.startswith(codecs.BOM_UTF8):
+		likely = ["utf-8-sig"]
+	elif encoded.startswith((codecs.BOM_UTF16_BE, codecs.BOM_UTF16_LE)):
+		likely = ["utf-16"]
+	elif len(encoded) % 2 == 0 and encoded[0::2].count(0) > len(encoded) // 4:
+		likely = ["utf-16-be"]
+	elif len(encoded) % 2 == 0 and encoded[1::2].count(0) > len(encoded) // 4:
+		likely = ["utf-16-le"]
+	else:
+		likely = ["utf-8", "latin-1"]
+	return likely + [encoding for encoding in encodings if encoding not in likely]
 
 def hex_to_bytes(hex: str) -> bytes:
-	return bytes(
-		int(hex[i:i + 2], 16)
-		for i in range(0, len(hex), 2)
-	)
+	return bytes.fromhex(hex)
 
 def is_latin_word(word: str) -> bool:
-	return all(
-		unicodedata.category(char) in ["Lu", "Ll"]
-		for char in word
-	)
+	return all(is_latin_letter(char) for char in word)
 
-def solve_puzzle(words: list[str], puzzle: list[str], start_puzzle_index:int = 0, used_word_indexes: set[int] = set()) -> int | None:
-	if start_puzzle_index == len(puzzle):
-		return 0
-	match_pattern = puzzle[start_puzzle_index]
-	match_indexes = [
-		index
-		for (index, word) in enumerate(words, 1)
-		if index not in used_word_indexes and word_matches(word, match_pattern)
+@functools.cache
+def is_latin_letter(char: str) -> bool:
+	return unicodedata.category(char) in ["Lu", "Ll"]
+
+def solve_puzzle(words: list[str], puzzle: list[str]) -> int | None:
+	candidates = [
+		[
+			index
+			for (index, word) in enumerate(words, 1)
+			if word_matches(word, pattern)
+		]
+		for pattern in puzzle
 	]
-	for index in match_indexes:
-		solution = solve_puzzle(words, puzzle, start_puzzle_index+1, used_word_indexes | {index})
+	return assign_words(candidates, 0, set())
+
+def assign_words(candidates: list[list[int]], start_puzzle_index: int, used_word_indexes: set[int]) -> int | None:
+	if start_puzzle_index == len(candidates):
+		return 0
+	if not has_matching(candidates[start_puzzle_index:], used_word_indexes):
+		return None
+	for index in candidates[start_puzzle_index]:
+		if index in used_word_indexes:
+			continue
+		solution = assign_words(candidates, start_puzzle_index + 1, used_word_indexes | {index})
 		if solution is not None:
 			return solution + index
 	return None
 
+def has_matching(candidates: list[list[int]], used_word_indexes: set[int]) -> bool:
+	slot_for_word: dict[int, int] = {}
+
+	def augment(slot: int, visited: set[int]) -> bool:
+		for index in candidates[slot]:
+			if index in used_word_indexes or index in visited:
+				continue
+			visited.add(index)
+			if index not in slot_for_word or augment(slot_for_word[index], visited):
+				slot_for_word[index] = slot
+				return True
+		return False
+
+	return all(augment(slot, set()) for slot in range(len(candidates)))
+
 def word_matches(word: str, pattern: str):
 	if len(word) != len(pattern):
 		return False
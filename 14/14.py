@@ -1,5 +1,5 @@
 from typing import Iterator
-import fractions
+import functools
 
 use_test = False
 numerals = {
@@ -18,67 +18,55 @@ numerals = {
 	"万": 10_000, # man
 	"億": 100_000_000 # ichioku
 }
+# Lengths in mo, the smallest unit
 length_units = {
-	"毛": fractions.Fraction(1, 10_000), # mo
-	"厘": fractions.Fraction(1, 1_000), # rin
-	"分": fractions.Fraction(1, 100), # bu
-	"寸": fractions.Fraction(1, 10), # sun
-	"尺": fractions.Fraction(1), # shaku,
-	"間": fractions.Fraction(6), # ken
-	"丈": fractions.Fraction(10), # jo
-	"町": fractions.Fraction(360), # cho
-	"里": fractions.Fraction(12_960) # ri
+	"毛": 1, # mo
+	"厘": 10, # rin
+	"分": 100, # bu
+	"寸": 1_000, # sun
+	"尺": 10_000, # shaku,
+	"間": 60_000, # ken
+	"丈": 100_000, # jo
+	"町": 3_600_000, # cho
+	"里": 129_600_000 # ri
 }
+shaku_meters = (10, 33)
 
 def run(lines: Iterator[str]):
 	print(sum(
-		int(parse_area_sqm(line))
+		parse_area_sqm(line)
 		for line in lines
 	))
 
 def parse_area_sqm(area_line: str) -> int:
 	(width, height) = split_on(area_line, "\xd7")
+	(meters, shaku) = shaku_meters
 	return (
-		parse_japanese_length_meters(width.strip())
-		* parse_japanese_length_meters(height.strip())
+		parse_japanese_length_mo(width.strip())
+		* parse_japanese_length_mo(height.strip())
+		* meters ** 2
+		// (shaku * length_units["尺"]) ** 2
 	)
 
+@functools.lru_cache(maxsize=4096)
 def parse_japanese_numeral(numeral: str) -> int:
-	if len(numeral) == 0:
-		return 0
-	if numeral in numerals:
-		return numerals[numeral]
-	rest = numeral
-	(ichioku, rest) = partial_parse_numeral(rest, "億")
-	(man, rest) = partial_parse_numeral(rest, "万")
-	(sen, rest) = partial_parse_numeral(rest, "千")
-	(hyaku, rest) = partial_parse_numeral(rest, "百")
-	(ju, rest) = partial_parse_numeral(rest, "十")
-	return (
-		ichioku
-		+ man
-		+ sen
-		+ hyaku
-		+ ju
-		+ parse_japanese_numeral(rest)
-	)
+	total = 0 # completed 万 and 億 groups
+	section = 0 # completed 十, 百 and 千 places within the current group
+	digit = 0
+	for char in numeral:
+		value = numerals[char]
+		if value < 10:
+			digit = value
+		elif value < 10_000:
+			section += (digit or 1) * value
+			digit = 0
+		else:
+			total += ((section + digit) or 1) * value
+			(section, digit) = (0, 0)
+	return total + section + digit
 
-def partial_parse_numeral(numeral: str, multiplier: str) -> tuple[int, str]:
-	if multiplier not in numeral:
-		return (0, numeral)
-	(mult_value, rest) = split_on(numeral, multiplier)
-	return (
-		(parse_japanese_numeral(mult_value) if len(mult_value) > 0 else 1)
-		* numerals[multiplier],
-		rest
-	)
-
-def parse_japanese_length_meters(length: str) -> int:
-	return (
-		parse_japanese_numeral(length[:-1])
-		* length_units[length[-1]]
-		* fractions.Fraction(10, 33)
-	)
+def parse_japanese_length_mo(length: str) -> int:
+	return parse_japanese_numeral(length[:-1]) * length_units[length[-1]]
 
 def split_on(string: str, split: str) -> tuple[str, str]:
 	if split not in string:
@@ -1,9 +1,13 @@
 from typing import Iterable
 from zoneinfo import ZoneInfo
+from concurrent.futures import ProcessPoolExecutor
 import datetime
+import itertools
 import schedule
+from period import EpochMultiPeriod
 
 use_test = False
+use_processes = True
 months = {
 	"January": 1,
 	"February": 2,
@@ -30,21 +34,36 @@ def run(lines: Iterable[str]):
 		(_, tz, holidays) = parse_office(line)
 		customers.append(schedule.AllDaySchedule(tz, holidays))
 	
-	overtime = [
-		(
-			schedules_over_year([customer], 2022)
-			- schedules_over_year(support, 2022)
-		).duration()
-		for customer in customers
-	]
+	support_year = EpochMultiPeriod(schedules_over_year(support, 2022))
+	overtime = customers_overtime(customers, support_year, 2022)
 	print((max(overtime) - min(overtime)) // datetime.timedelta(minutes=1))
 
+def customers_overtime(customers: list[schedule.Schedule], support_year: EpochMultiPeriod, utc_year: int) -> list[datetime.timedelta]:
+	if not use_processes:
+		return [customer_overtime(customer, support_year, utc_year) for customer in customers]
+	# The support coverage is sent to each worker once, rather than with every customer
+	with ProcessPoolExecutor(initializer=set_worker_support, initargs=(support_year,)) as executor:
+		return list(executor.map(
+			worker_customer_overtime,
+			customers,
+			itertools.repeat(utc_year),
+			chunksize=max(1, len(customers) // 64)
+		))
+
+def customer_overtime(customer: schedule.Schedule, support_year: EpochMultiPeriod, utc_year: int) -> datetime.timedelta:
+	return (EpochMultiPeriod(customer.over_year(utc_year)) - support_year).duration()
+
+worker_support: EpochMultiPeriod | None = None
+
+def set_worker_support(support_year: EpochMultiPeriod):
+	global worker_support
+	worker_support = support_year
+
+def worker_customer_overtime(customer: schedule.Schedule, utc_year: int) -> datetime.timedelta:
+	return customer_overtime(customer, worker_support, utc_year)
+
 def schedules_over_year(schedules: Iterable[schedule.Schedule], utc_year: int) -> schedule.MultiPeriod:
-	year = schedule.TimePeriod(
-		datetime.datetime(utc_year, 1, 1, tzinfo=ZoneInfo("UTC")),
-		datetime.datetime(utc_year + 1, 1, 1, tzinfo=ZoneInfo("UTC"))
-	)
-	return schedule.MultiPeriod().union(*(sched.over_period(year) for sched in schedules))
+	return schedule.MultiPeriod().union(*(sched.over_year(utc_year) for sched in schedules))
 
 def parse_office(office_line: str) -> tuple[str, ZoneInfo, frozenset[datetime.date]]:
 	[name, tz_name, holidays] = office_line.split("\t")
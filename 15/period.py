@@ -1,7 +1,12 @@
 from typing import Iterable, Iterator, Self
+from array import array
+import bisect
 import datetime
-import itertools
 import functools
+import heapq
+
+epoch = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+one_second = datetime.timedelta(seconds=1)
 
 class TimePeriod(object):
 	__slots__ = ["_TimePeriod__start", "_TimePeriod__end"]
@@ -76,31 +81,52 @@ class TimePeriod(object):
 
 class MultiPeriod(object):
 	def __init__(self, periods: Iterable[TimePeriod] = []):
-		periods = list(periods)
-		periods.sort(key=lambda period: period.start)
-		i = 0
-		while i < len(periods):
-			while (i + 1) < len(periods) and periods[i].touches(periods[i + 1]):
-				periods[i] = TimePeriod(periods[i].start, periods[i + 1].end)
-				periods.pop(i + 1)
-			i += 1
-		self.__periods = periods
+		self.__periods = MultiPeriod.__merge_sorted(sorted(periods, key=lambda period: period.start))
+
+	@classmethod
+	def __from_disjoint(cls, periods: list[TimePeriod]) -> Self:
+		multi = cls.__new__(cls)
+		multi.__periods = periods
+		return multi
+
+	@staticmethod
+	def __merge_sorted(periods: Iterable[TimePeriod]) -> list[TimePeriod]:
+		merged: list[TimePeriod] = []
+		for period in periods:
+			if period.start == period.end:
+				continue
+			if len(merged) > 0 and merged[-1].touches(period):
+				if period.end > merged[-1].end:
+					merged[-1] = TimePeriod(merged[-1].start, period.end)
+			else:
+				merged.append(period)
+		return merged
 	
 	def __iter__(self) -> Iterator[TimePeriod]:
 		return iter(self.__periods)
 
 	def union(self, *others: Self) -> Self:
-		return MultiPeriod(itertools.chain(self, *others))
+		return MultiPeriod.__from_disjoint(MultiPeriod.__merge_sorted(
+			heapq.merge(self, *others, key=lambda period: period.start)
+		))
 	
 	def intersection(self, *others: Self) -> Self:
-		periods = list(self)
+		periods = self.__periods
 		for other in others:
 			intersections: list[TimePeriod] = []
-			for self_period in periods:
-				for other_period in other:
-					intersections += other_period.intersection(self_period)
+			(i, j) = (0, 0)
+			while i < len(periods) and j < len(other.__periods):
+				(self_period, other_period) = (periods[i], other.__periods[j])
+				start = max(self_period.start, other_period.start)
+				end = min(self_period.end, other_period.end)
+				if start < end:
+					intersections.append(TimePeriod(start, end))
+				if self_period.end < other_period.end:
+					i += 1
+				else:
+					j += 1
 			periods = intersections
-		return MultiPeriod(periods)
+		return MultiPeriod.__from_disjoint(periods)
 	
 	def duration(self) -> datetime.timedelta:
 		return functools.reduce(
@@ -110,16 +136,158 @@ class MultiPeriod(object):
 		)
 	
 	def __sub__(self, other: Self) -> Self:
-		periods = list(self)
-		for isect_period in self.intersection(other):
-			i = 0
-			while i < len(periods):
-				self_period = periods[i]
-				sub_periods = list(self_period - isect_period)
-				periods[i : i + 1] = sub_periods
-				i += len(sub_periods)
-		return MultiPeriod(periods)
+		differences: list[TimePeriod] = []
+		j = 0
+		for self_period in self.__periods:
+			current = self_period.start
+			while j < len(other.__periods) and other.__periods[j].end <= current:
+				j += 1
+			k = j
+			while k < len(other.__periods) and other.__periods[k].start < self_period.end:
+				if other.__periods[k].start > current:
+					differences.append(TimePeriod(current, other.__periods[k].start))
+				current = max(current, other.__periods[k].end)
+				k += 1
+			if current < self_period.end:
+				differences.append(TimePeriod(current, self_period.end))
+		return MultiPeriod.__from_disjoint(differences)
 	
 	def __str__(self) -> str:
 		joined = ", ".join(str(period) for period in self.__periods)
-		return f"[{joined}]"
\ No newline at end of file
+		return f"[{joined}]"
+
+class EpochMultiPeriod(object):
+	__slots__ = ["_EpochMultiPeriod__starts", "_EpochMultiPeriod__ends", "_EpochMultiPeriod__covered_before"]
+	def __init__(self, periods: Iterable[TimePeriod] = []):
+		(self.__starts, self.__ends) = EpochMultiPeriod.__merge_sorted(sorted(
+			(to_epoch_seconds(period.start), to_epoch_seconds(period.end))
+			for period in periods
+		))
+		self.__covered_before = None
+
+	@classmethod
+	def from_epoch_seconds(cls, starts: Iterable[int], ends: Iterable[int]) -> Self:
+		return cls.__from_disjoint(*EpochMultiPeriod.__merge_sorted(sorted(zip(starts, ends))))
+
+	@classmethod
+	def __from_disjoint(cls, starts: array, ends: array) -> Self:
+		multi = cls.__new__(cls)
+		(multi.__starts, multi.__ends) = (starts, ends)
+		multi.__covered_before = None
+		return multi
+
+	@staticmethod
+	def __merge_sorted(periods: Iterable[tuple[int, int]]) -> tuple[array, array]:
+		(starts, ends) = (array("q"), array("q"))
+		for (start, end) in periods:
+			if start > end:
+				raise ValueError(f"Time period start {start} is after end {end}")
+			if start == end:
+				continue
+			if len(ends) > 0 and start <= ends[-1]:
+				if end > ends[-1]:
+					ends[-1] = end
+			else:
+				starts.append(start)
+				ends.append(end)
+		return (starts, ends)
+
+	@property
+	def starts(self) -> array:
+		return self.__starts
+
+	@property
+	def ends(self) -> array:
+		return self.__ends
+
+	def __len__(self) -> int:
+		return len(self.__starts)
+
+	def __iter__(self) -> Iterator[TimePeriod]:
+		for (start, end) in zip(self.__starts, self.__ends):
+			yield TimePeriod(from_epoch_seconds(start), from_epoch_seconds(end))
+
+	def union(self, *others: Self) -> Self:
+		return EpochMultiPeriod.__from_disjoint(*EpochMultiPeriod.__merge_sorted(heapq.merge(
+			*(zip(multi.__starts, multi.__ends) for multi in [self, *others])
+		)))
+
+	def intersection(self, *others: Self) -> Self:
+		(starts, ends) = (self.__starts, self.__ends)
+		for other in others:
+			(isect_starts, isect_ends) = (array("q"), array("q"))
+			(i, j) = (0, 0)
+			while i < len(starts) and j < len(other.__starts):
+				start = max(starts[i], other.__starts[j])
+				end = min(ends[i], other.__ends[j])
+				if start < end:
+					isect_starts.append(start)
+					isect_ends.append(end)
+				if ends[i] < other.__ends[j]:
+					i += 1
+				else:
+					j += 1
+			(starts, ends) = (isect_starts, isect_ends)
+		return EpochMultiPeriod.__from_disjoint(starts, ends)
+
+	def duration(self) -> datetime.timedelta:
+		return datetime.timedelta(seconds=sum(self.__ends) - sum(self.__starts))
+
+	def __contains__(self, dt: datetime.datetime) -> bool:
+		return self.__contains_seconds(to_epoch_seconds(dt))
+
+	def contains_each(self, dts: Iterable[datetime.datetime]) -> list[bool]:
+		return [self.__contains_seconds(to_epoch_seconds(dt)) for dt in dts]
+
+	def __contains_seconds(self, seconds: int) -> bool:
+		i = bisect.bisect_right(self.__starts, seconds) - 1
+		return i >= 0 and seconds < self.__ends[i]
+
+	def covered_duration(self, period: TimePeriod) -> datetime.timedelta:
+		return datetime.timedelta(seconds=(
+			self.__covered_until(to_epoch_seconds(period.end))
+			- self.__covered_until(to_epoch_seconds(period.start))
+		))
+
+	def covered_durations(self, periods: Iterable[TimePeriod]) -> list[datetime.timedelta]:
+		return [self.covered_duration(period) for period in periods]
+
+	def __covered_until(self, seconds: int) -> int:
+		if self.__covered_before is None:
+			# Total seconds covered by the periods before each index
+			self.__covered_before = array("q", [0])
+			for (start, end) in zip(self.__starts, self.__ends):
+				self.__covered_before.append(self.__covered_before[-1] + end - start)
+		i = bisect.bisect_right(self.__starts, seconds) - 1
+		if i < 0:
+			return 0
+		return self.__covered_before[i] + min(seconds, self.__ends[i]) - self.__starts[i]
+
+	def __sub__(self, other: Self) -> Self:
+		(diff_starts, diff_ends) = (array("q"), array("q"))
+		j = 0
+		for (self_start, self_end) in zip(self.__starts, self.__ends):
+			current = self_start
+			while j < len(other.__starts) and other.__ends[j] <= current:
+				j += 1
+			k = j
+			while k < len(other.__starts) and other.__starts[k] < self_end:
+				if other.__starts[k] > current:
+					diff_starts.append(current)
+					diff_ends.append(other.__starts[k])
+				current = max(current, other.__ends[k])
+				k += 1
+			if current < self_end:
+				diff_starts.append(current)
+				diff_ends.append(self_end)
+		return EpochMultiPeriod.__from_disjoint(diff_starts, diff_ends)
+
+	def __str__(self) -> str:
+		joined = ", ".join(str(period) for period in self)
+		return f"[{joined}]"
+
+def to_epoch_seconds(dt: datetime.datetime) -> int:
+	return (dt - epoch) // one_second
+
+def from_epoch_seconds(seconds: int) -> datetime.datetime:
+	return epoch + datetime.timedelta(seconds=seconds)
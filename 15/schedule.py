@@ -1,5 +1,6 @@
 from typing import Iterable
 import datetime
+import functools
 from zoneinfo import ZoneInfo
 from period import TimePeriod, MultiPeriod
 
@@ -13,6 +14,10 @@ class Schedule(object):
 			periods_in_range.append(current)
 			current = self.next_period(current.end)
 		return MultiPeriod(periods_in_range).intersection(MultiPeriod([period]))
+	def over_year(self, utc_year: int) -> MultiPeriod:
+		return self.over_period(utc_year_period(utc_year))
+	def over_years(self, utc_years: Iterable[int]) -> dict[int, MultiPeriod]:
+		return {utc_year: self.over_year(utc_year) for utc_year in utc_years}
 
 class WeekdaySchedule(Schedule):
 	def __init__(self, timezone: ZoneInfo, holidays: Iterable[datetime.date]):
@@ -31,6 +36,24 @@ class WeekdaySchedule(Schedule):
 			test_date += datetime.timedelta(days=1)
 		return self.possible_period_on_day(test_date)
 
+	def workdays(self, first: datetime.date, last: datetime.date) -> list[datetime.date]:
+		return [
+			day
+			for day in map(datetime.date.fromordinal, range(first.toordinal(), last.toordinal() + 1))
+			if is_weekday(day) and day not in self.holidays
+		]
+
+	def over_period(self, period):
+		# Local dates that may overlap the period, with a day to spare on each side
+		first = period.start.astimezone(self.timezone).date() - datetime.timedelta(days=1)
+		last = period.end.astimezone(self.timezone).date() + datetime.timedelta(days=1)
+		return MultiPeriod(
+			self.possible_period_on_day(day) for day in self.workdays(first, last)
+		).intersection(MultiPeriod([period]))
+
+	def over_year(self, utc_year):
+		return weekday_schedule_over_year(type(self), self.timezone, self.holidays, utc_year)
+
 class SupportSchedule(WeekdaySchedule):
 	def possible_period_on_day(self, day):
 		return TimePeriod(
@@ -45,6 +68,23 @@ class AllDaySchedule(WeekdaySchedule):
 			datetime_from(day + datetime.timedelta(days=1), datetime.time(0, 0), self.timezone)
 		)
 
+# Schedules are cached by their class, time zone and holidays, so offices
+# sharing those share the generated periods
+@functools.cache
+def weekday_schedule_over_year(
+		schedule_type: type[WeekdaySchedule],
+		timezone: ZoneInfo,
+		holidays: frozenset[datetime.date],
+		utc_year: int
+	) -> MultiPeriod:
+	return schedule_type(timezone, holidays).over_period(utc_year_period(utc_year))
+
+def utc_year_period(utc_year: int) -> TimePeriod:
+	return TimePeriod(
+		datetime.datetime(utc_year, 1, 1, tzinfo=ZoneInfo("UTC")),
+		datetime.datetime(utc_year + 1, 1, 1, tzinfo=ZoneInfo("UTC"))
+	)
+
 def is_weekday(date: datetime.date) -> bool:
 	return date.weekday() <= 4
 
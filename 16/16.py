@@ -1,22 +1,50 @@
 from typing import Iterator, Self
+from collections import deque
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import math
+import time
 import box_drawing
 
 use_test = False
+use_packed_grid = True
+use_processes = False
 
 def run(lines: Iterator[str]):
 	(top_left, bottom_right) = (
 		((0, 0), (7, 11)) if use_test
 		else ((4, 7), (19, 72))
 	)
-	game = PipesGrid.from_screen(list(lines), top_left, bottom_right)
-	rotations = game.lock_known()
-	print(game)
+	if use_packed_grid:
+		game = PackedPipesGrid.from_screen(list(lines), top_left, bottom_right)
+		(rotations, stats) = game.solve(use_processes)
+		print(game)
+		print(stats)
+	else:
+		game = PipesGrid.from_screen(list(lines), top_left, bottom_right)
+		rotations = game.lock_known()
+		print(game)
 	if game.all_locked():
 		print(f"Solved in {rotations} rotations")
 
 class PipeGameError(Exception):
 	pass
 
+class SearchStats(object):
+	def __init__(self):
+		self.nodes = 0
+		self.backtracks = 0
+		self.propagation_seconds = 0.0
+
+	def add(self, other: Self):
+		self.nodes += other.nodes
+		self.backtracks += other.backtracks
+		self.propagation_seconds += other.propagation_seconds
+
+	def __str__(self) -> str:
+		return f"Searched {self.nodes} nodes with {self.backtracks} backtracks, propagating for {self.propagation_seconds:.3f}s"
+
 class GameCell(object):
 	def clone(self) -> Self:
 		raise NotImplementedError()
@@ -78,18 +106,24 @@ class PipeCell(GameCell):
 	def clone(self) -> Self:
 		return PipeCell(self.__box_char, self.__locked)
 
+# Remaining (rotation count, rotated character) options for an unlocked cell
+RotationDomain = list[tuple[int, box_drawing.BoxChar]]
+
 class PipesGrid(object):
-	def __init__(self, grid: list[list[GameCell]]):
+	def __init__(self, grid: list[list[GameCell]], domains: dict[tuple[int, int], RotationDomain] | None = None):
 		self.__grid = list(list(cell.clone() for cell in row) for row in grid)
+		self.__domains = dict(domains) if domains is not None else {
+			(y, x): list(box_drawing.rotations(cell.box_char))
+			for (y, row) in enumerate(self.__grid)
+			for (x, cell) in enumerate(row)
+			if not cell.is_locked
+		}
 	
 	def clone(self) -> Self:
-		return PipesGrid(self.__grid)
+		return PipesGrid(self.__grid, self.__domains)
 	
 	def lock_known(self) -> int:
-		total_rotations = 0
-		while (rotations := self.__expand_locked()) != 0:
-			total_rotations += rotations
-		return total_rotations
+		return self.__propagate(deque(self.__domains))
 	
 	def all_locked(self) -> bool:
 		return all(
@@ -97,25 +131,45 @@ class PipesGrid(object):
 			for row in self.__grid
 		)
 	
-	def __expand_locked(self) -> int:
+	def __propagate(self, queue: deque[tuple[int, int]]) -> int:
 		total_rotations = 0
-		for (y, row) in enumerate(self.__grid):
-			for (x, cell) in enumerate(row):
-				if isinstance(cell, PipeCell) and not cell.is_locked:
-					rotations = list(possible_valid_rotations(
-						cell,
-						self.cell_at(y - 1, x),
-						self.cell_at(y, x + 1),
-						self.cell_at(y + 1, x),
-						self.cell_at(y, x - 1)
-					))
-					if len(rotations) == 0:
-						raise PipeGameError("No valid rotations")
-					if len(rotations) == 1:
-						total_rotations += cell.rotate_cw(rotations[0])
-						cell.lock()
+		queued = set(queue)
+		while len(queue) > 0:
+			(y, x) = position = queue.popleft()
+			queued.remove(position)
+			if position not in self.__domains:
+				continue
+			domain = self.__domains[position]
+			valid = possible_valid_rotations(
+				domain,
+				self.__facing_edges(y - 1, x, "S"),
+				self.__facing_edges(y, x + 1, "W"),
+				self.__facing_edges(y + 1, x, "N"),
+				self.__facing_edges(y, x - 1, "E")
+			)
+			if len(valid) == 0:
+				raise PipeGameError("No valid rotations")
+			if len(valid) == len(domain):
+				continue
+			if len(valid) == 1:
+				[(rotation_count, _)] = valid
+				cell = self.__grid[y][x]
+				total_rotations += cell.rotate_cw(rotation_count)
+				cell.lock()
+				del self.__domains[position]
+			else:
+				self.__domains[position] = valid
+			for neighbor in [(y - 1, x), (y, x + 1), (y + 1, x), (y, x - 1)]:
+				if neighbor in self.__domains and neighbor not in queued:
+					queue.append(neighbor)
+					queued.add(neighbor)
 		return total_rotations
 
+	def __facing_edges(self, y: int, x: int, side: str) -> set[int]:
+		if (y, x) in self.__domains:
+			return {getattr(rotated, side) for (_, rotated) in self.__domains[(y, x)]}
+		return {getattr(self.cell_at(y, x).box_char, side)}
+
 	def cell_at(self, y: int, x: int) -> GameCell:
 		return self.__grid[y][x] if (
 			0 <= y < len(self.__grid)
@@ -149,26 +203,260 @@ class PipesGrid(object):
 			for (y, row) in enumerate(screen)
 		)
 
+# Packed cells hold a packed box character, plus this bit once locked
+locked_bit = 1 << 8
+
+class PackedPipesGrid(object):
+	def __init__(self, screen: list[str], top_left: tuple[int, int], stride: int, cells: array, domains: bytearray):
+		self.__screen = screen
+		self.__top_left = top_left
+		self.__stride = stride
+		# Cells in rows of stride, with a border of locked blank cells
+		self.__cells = cells
+		# For each unlocked cell, a bit for each rotation count still possible
+		self.__domains = domains
+		# Previous (index, cell, domain) values, for undoing search guesses
+		self.__trail: list[tuple[int, int, int]] = []
+
+	def clone(self) -> Self:
+		return PackedPipesGrid(self.__screen, self.__top_left, self.__stride, array("H", self.__cells), bytearray(self.__domains))
+
+	def lock_known(self) -> int:
+		total_rotations = self.__propagate(deque(self.__unlocked()))
+		self.__trail.clear()
+		return total_rotations
+
+	def solve(self, parallel: bool = False) -> tuple[int | None, SearchStats]:
+		stats = SearchStats()
+		total_rotations = self.__timed_propagate(deque(self.__unlocked()), stats)
+		self.__trail.clear()
+		index = self.__branch_cell()
+		if index is None:
+			stats.nodes += 1
+			return (total_rotations, stats)
+		if parallel:
+			with ProcessPoolExecutor() as executor:
+				branches = list(executor.map(
+					solve_branch,
+					itertools.repeat(self),
+					itertools.repeat(index),
+					rotation_counts(self.__domains[index])
+				))
+			solutions = []
+			for (solution, branch_stats) in branches:
+				stats.add(branch_stats)
+				if solution is not None:
+					solutions.append(solution)
+			best = min(solutions, key=lambda solution: solution[0], default=None)
+		else:
+			best = self.__search(0, math.inf, stats)
+		if best is None:
+			return (None, stats)
+		(search_rotations, cells) = best
+		self.__cells[:] = cells
+		self.__domains[:] = bytes(len(self.__domains))
+		return (total_rotations + search_rotations, stats)
+
+	def solve_branch(self, index: int, rotation_count: int) -> tuple[tuple[int, array] | None, SearchStats]:
+		stats = SearchStats()
+		try:
+			rotations = self.__guess(index, rotation_count, stats)
+		except PipeGameError:
+			stats.nodes += 1
+			stats.backtracks += 1
+			return (None, stats)
+		return (self.__search(rotations, math.inf, stats), stats)
+
+	def __search(self, rotations: int, bound: float, stats: SearchStats) -> tuple[int, array] | None:
+		stats.nodes += 1
+		if rotations + self.__fewest_remaining_rotations() >= bound:
+			stats.backtracks += 1
+			return None
+		index = self.__branch_cell()
+		if index is None:
+			return (rotations, array("H", self.__cells))
+		best = None
+		for rotation_count in rotation_counts(self.__domains[index]):
+			mark = len(self.__trail)
+			try:
+				solution = self.__search(rotations + self.__guess(index, rotation_count, stats), bound, stats)
+				if solution is not None:
+					best = solution
+					(bound, _) = solution
+			except PipeGameError:
+				stats.backtracks += 1
+			self.__undo(mark)
+		return best
+
+	def __guess(self, index: int, rotation_count: int, stats: SearchStats) -> int:
+		return (
+			self.__restrict(index, 1 << rotation_count)
+			+ self.__timed_propagate(deque(self.__neighbors(index)), stats)
+		)
+
+	def __timed_propagate(self, queue: deque[int], stats: SearchStats) -> int:
+		start = time.perf_counter()
+		try:
+			return self.__propagate(queue)
+		finally:
+			stats.propagation_seconds += time.perf_counter() - start
+
+	def __branch_cell(self) -> int | None:
+		return min(
+			self.__unlocked(),
+			key=lambda index: self.__domains[index].bit_count(),
+			default=None
+		)
+
+	def __fewest_remaining_rotations(self) -> int:
+		return sum(
+			(self.__domains[index] & -self.__domains[index]).bit_length() - 1
+			for index in self.__unlocked()
+		)
+
+	def __unlocked(self) -> Iterator[int]:
+		return (
+			index for (index, cell) in enumerate(self.__cells)
+			if not cell & locked_bit
+		)
+
+	def __neighbors(self, index: int) -> list[int]:
+		return [
+			neighbor
+			for neighbor in [index - self.__stride, index + 1, index + self.__stride, index - 1]
+			if not self.__cells[neighbor] & locked_bit
+		]
+
+	def __restrict(self, index: int, domain: int) -> int:
+		self.__trail.append((index, self.__cells[index], self.__domains[index]))
+		if domain.bit_count() != 1:
+			self.__domains[index] = domain
+			return 0
+		rotation_count = domain.bit_length() - 1
+		rotated = self.__cells[index]
+		for _ in range(rotation_count):
+			rotated = box_drawing.packed_rotated_cw[rotated]
+		self.__cells[index] = rotated | locked_bit
+		self.__domains[index] = 0
+		return rotation_count
+
+	def __undo(self, mark: int):
+		while len(self.__trail) > mark:
+			(index, cell, domain) = self.__trail.pop()
+			self.__cells[index] = cell
+			self.__domains[index] = domain
+
+	def all_locked(self) -> bool:
+		return all(cell & locked_bit for cell in self.__cells)
+
+	def __propagate(self, queue: deque[int]) -> int:
+		total_rotations = 0
+		queued = set(queue)
+		while len(queue) > 0:
+			index = queue.popleft()
+			queued.remove(index)
+			cell = self.__cells[index]
+			if cell & locked_bit:
+				continue
+			domain = self.__domains[index]
+			valid = self.__valid_rotations(index)
+			if valid == 0:
+				raise PipeGameError("No valid rotations")
+			if valid == domain:
+				continue
+			total_rotations += self.__restrict(index, valid)
+			for neighbor in self.__neighbors(index):
+				if neighbor not in queued:
+					queue.append(neighbor)
+					queued.add(neighbor)
+		return total_rotations
+
+	def __valid_rotations(self, index: int) -> int:
+		north = self.__edge_bits(index - self.__stride).S
+		east = self.__edge_bits(index + 1).W
+		south = self.__edge_bits(index + self.__stride).N
+		west = self.__edge_bits(index - 1).E
+		domain = self.__domains[index]
+		valid = 0
+		for (rotation_count, rotated) in box_drawing.packed_rotation_options[self.__cells[index]]:
+			edges = box_drawing.packed_edge_bits[rotated]
+			if (
+				domain & (1 << rotation_count)
+				and edges.N & north
+				and edges.E & east
+				and edges.S & south
+				and edges.W & west
+			):
+				valid |= 1 << rotation_count
+		return valid
+
+	def __edge_bits(self, index: int) -> box_drawing.BoxChar:
+		cell = self.__cells[index]
+		if cell & locked_bit:
+			return box_drawing.packed_edge_bits[cell & 0xFF]
+		domain = self.__domains[index]
+		(north, east, south, west) = (0, 0, 0, 0)
+		for (rotation_count, rotated) in box_drawing.packed_rotation_options[cell]:
+			if domain & (1 << rotation_count):
+				edges = box_drawing.packed_edge_bits[rotated]
+				(north, east, south, west) = (north | edges.N, east | edges.E, south | edges.S, west | edges.W)
+		return box_drawing.BoxChar(north, east, south, west)
+
+	def __str__(self) -> str:
+		(top_left_y, top_left_x) = self.__top_left
+		rows = [list(row) for row in self.__screen]
+		for y in range(1, len(self.__cells) // self.__stride - 1):
+			for x in range(1, self.__stride - 1):
+				(screen_y, screen_x) = (top_left_y + y - 1, top_left_x + x - 1)
+				if screen_x < len(rows[screen_y]) and rows[screen_y][screen_x] in box_drawing.box_chars:
+					packed = self.__cells[y * self.__stride + x] & 0xFF
+					rows[screen_y][screen_x] = box_drawing.reverse_map[box_drawing.unpack_box_char(packed)]
+		return "\n".join("".join(row) for row in rows)
+
+	@staticmethod
+	def from_screen(screen: list[str], top_left: tuple[int, int], bottom_right: tuple[int, int]):
+		(top_left_y, top_left_x) = top_left
+		(bottom_right_y, bottom_right_x) = bottom_right
+		stride = bottom_right_x - top_left_x + 3
+		cells = array("H", [locked_bit]) * (stride * (bottom_right_y - top_left_y + 3))
+		domains = bytearray(len(cells))
+		for y in range(top_left_y, bottom_right_y + 1):
+			for x in range(top_left_x, min(bottom_right_x + 1, len(screen[y]))):
+				if screen[y][x] not in box_drawing.box_chars:
+					continue
+				index = (y - top_left_y + 1) * stride + (x - top_left_x + 1)
+				packed = box_drawing.pack_box_char(box_drawing.box_chars[screen[y][x]])
+				options = box_drawing.packed_rotation_options[packed]
+				if (y, x) in [top_left, bottom_right] or len(options) == 1:
+					cells[index] = packed | locked_bit
+				else:
+					cells[index] = packed
+					domains[index] = sum(1 << rotation_count for (rotation_count, _) in options)
+		return PackedPipesGrid(screen, top_left, stride, cells, domains)
+
+def solve_branch(grid: PackedPipesGrid, index: int, rotation_count: int) -> tuple[tuple[int, array] | None, SearchStats]:
+	return grid.solve_branch(index, rotation_count)
+
+def rotation_counts(domain: int) -> list[int]:
+	return [rotation_count for rotation_count in range(4) if domain & (1 << rotation_count)]
+
 def possible_valid_rotations(
-		cell: GameCell,
-		north: GameCell,
-		east: GameCell,
-		south: GameCell,
-		west: GameCell
-	) -> Iterator[int]:
-	north_edges = box_drawing.edge_counts(north.box_char) if not north.is_locked else {north.box_char.S}
-	east_edges = box_drawing.edge_counts(east.box_char) if not east.is_locked else {east.box_char.W}
-	south_edges = box_drawing.edge_counts(south.box_char) if not south.is_locked else {south.box_char.N}
-	west_edges = box_drawing.edge_counts(west.box_char) if not west.is_locked else {west.box_char.E}
-	
-	for (rotation_count, rotated) in box_drawing.rotations(cell.box_char):
+		domain: RotationDomain,
+		north_edges: set[int],
+		east_edges: set[int],
+		south_edges: set[int],
+		west_edges: set[int]
+	) -> RotationDomain:
+	return [
+		(rotation_count, rotated)
+		for (rotation_count, rotated) in domain
 		if (
 			rotated.N in north_edges
 			and rotated.E in east_edges
 			and rotated.S in south_edges
 			and rotated.W in west_edges
-		):
-			yield rotation_count
+		)
+	]
 
 #region Common code
 if __name__ == "__main__":
@@ -75,4 +75,30 @@ box_chars = {
 	"┌": BoxChar(0, 1, 1, 0)
 }
 
-reverse_map = {bc: char for (char, bc) in box_chars.items()}
\ No newline at end of file
+reverse_map = {bc: char for (char, bc) in box_chars.items()}
+
+# Box characters packed into a byte, two bits per edge, N in the lowest bits
+packed_shifts = BoxChar(0, 2, 4, 6)
+
+def pack_box_char(char: BoxChar) -> int:
+	return char.N | (char.E << 2) | (char.S << 4) | (char.W << 6)
+
+def unpack_box_char(packed: int) -> BoxChar:
+	return BoxChar(*((packed >> shift) & 3 for shift in packed_shifts))
+
+def rotate_packed_cw(packed: int) -> int:
+	return ((packed << 2) | (packed >> 6)) & 0xFF
+
+def packed_rotations(packed: int) -> tuple[tuple[int, int], ...]:
+	return tuple(
+		(count, pack_box_char(rotation))
+		for (count, rotation) in rotations(unpack_box_char(packed))
+	)
+
+# Indexed by packed character
+packed_rotated_cw = [rotate_packed_cw(packed) for packed in range(256)]
+packed_rotation_options = [packed_rotations(packed) for packed in range(256)]
+packed_edge_bits = [
+	BoxChar(*(1 << ((packed >> shift) & 3) for shift in packed_shifts))
+	for packed in range(256)
+]
\ No newline at end of file
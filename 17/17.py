@@ -1,9 +1,17 @@
 from typing import Iterable, Iterator
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import codecs
+import multiprocessing
 import re
 
 use_test = False
+use_processes = False
 Fragment = list[bytes]
+# Byte-split signatures of each row of a fragment, and its edge flags
+FragmentEdges = namedtuple("FragmentEdges", ["starts", "ends", "is_left", "is_right", "is_top", "is_bottom"])
+# Fragments with their edges, indexed by the starts of their rows
+Puzzle = namedtuple("Puzzle", ["fragments", "edges", "by_starts", "heights", "left_edges", "right_edges", "top_edges"])
 horiz_edge = re.compile(r"[╔╚]?[-═]+[╗╝]?")
 
 def run(lines: Iterator[str]):
@@ -18,19 +26,7 @@ def run(lines: Iterator[str]):
 	writeToJS(solution);
 
 def solve(fragments: list[Fragment]) -> list[str]:
-	left_edges = {i for (i, f) in enumerate(fragments) if is_left_edge(f)}
-	right_edges = {i for (i, f) in enumerate(fragments) if is_right_edge(f)}
-	top_edges = {i for (i, f) in enumerate(fragments) if is_horiz_edge(f[0])}
-	solution = list(solve_helper(
-		[[] for _ in range(len(top_edges))],
-		fragments,
-		set(range(len(fragments))),
-		left_edges,
-		right_edges,
-		top_edges,
-		None
-	))[0]
-
+	solution = solve_parallel(fragments) if use_processes else next(solutions(fragments))
 	return [
 		b"".join(
 			solution[col_index][row_index]
@@ -39,60 +35,175 @@ def solve(fragments: list[Fragment]) -> list[str]:
 		for row_index in range(len(solution[0]))
 	]
 
+def count_solutions(fragments: list[Fragment]) -> int:
+	return sum(1 for _ in solutions(fragments))
+
+def solutions(fragments: list[Fragment]) -> Iterator[list[list[bytes]]]:
+	puzzle = make_puzzle(fragments)
+	return solve_helper(
+		Columns(len(puzzle.top_edges)),
+		puzzle,
+		set(range(len(fragments))),
+		None
+	)
+
+def make_puzzle(fragments: list[Fragment]) -> Puzzle:
+	edges = [fragment_edges(fragment) for fragment in fragments]
+	by_starts: dict[tuple[int, ...], list[int]] = {}
+	for (i, e) in enumerate(edges):
+		by_starts.setdefault(e.starts, []).append(i)
+	return Puzzle(
+		fragments,
+		edges,
+		by_starts,
+		{len(fragment) for fragment in fragments},
+		{i for (i, e) in enumerate(edges) if e.is_left},
+		{i for (i, e) in enumerate(edges) if e.is_right},
+		{i for (i, e) in enumerate(edges) if e.is_top}
+	)
+
+class Columns(object):
+	def __init__(self, col_count: int):
+		self.placed: list[list[int]] = [[] for _ in range(col_count)]
+		self.starts: list[list[int]] = [[] for _ in range(col_count)]
+		self.ends: list[list[int]] = [[] for _ in range(col_count)]
+
+	def push(self, col_index: int, frag_index: int, edges: FragmentEdges):
+		self.placed[col_index].append(frag_index)
+		self.starts[col_index].extend(edges.starts)
+		self.ends[col_index].extend(edges.ends)
+
+	def pop(self, col_index: int, edges: FragmentEdges):
+		self.placed[col_index].pop()
+		height = len(self.starts[col_index]) - len(edges.starts)
+		del self.starts[col_index][height:]
+		del self.ends[col_index][height:]
+
+	def lines(self, fragments: list[Fragment]) -> list[list[bytes]]:
+		return [
+			[line for frag_index in col for line in fragments[frag_index]]
+			for col in self.placed
+		]
+
+Move = tuple[int, int] # (column index, fragment index)
+
+def solve_parallel(fragments: list[Fragment], depth: int = 2) -> list[list[bytes]]:
+	puzzle = make_puzzle(fragments)
+	prefixes = branch_prefixes(
+		Columns(len(puzzle.top_edges)),
+		puzzle,
+		set(range(len(fragments))),
+		None,
+		depth
+	)
+	stop = multiprocessing.Event()
+	with ProcessPoolExecutor(initializer=set_worker_puzzle, initargs=(puzzle, stop)) as executor:
+		futures = [executor.submit(solve_branch, moves) for moves in prefixes]
+		for future in as_completed(futures):
+			solution = future.result()
+			if solution is not None:
+				stop.set()
+				for other in futures:
+					other.cancel()
+				return solution
+	raise ValueError("No solution found")
+
+def branch_prefixes(
+		columns: Columns,
+		puzzle: Puzzle,
+		all_pieces: set[int],
+		last_col_index: int | None,
+		depth: int
+	) -> Iterator[list[Move]]:
+	if depth == 0 or len(all_pieces) == 0:
+		yield []
+		return
+	(col_index, matches) = next_slot(columns, puzzle, all_pieces, last_col_index)
+	for match_index in matches:
+		columns.push(col_index, match_index, puzzle.edges[match_index])
+		for moves in branch_prefixes(columns, puzzle, all_pieces - {match_index}, col_index, depth - 1):
+			yield [(col_index, match_index)] + moves
+		columns.pop(col_index, puzzle.edges[match_index])
+
+worker_puzzle: Puzzle | None = None
+stop_event = None
+
+def set_worker_puzzle(puzzle: Puzzle, stop):
+	global worker_puzzle, stop_event
+	(worker_puzzle, stop_event) = (puzzle, stop)
+
+def solve_branch(moves: list[Move]) -> list[list[bytes]] | None:
+	columns = Columns(len(worker_puzzle.top_edges))
+	all_pieces = set(range(len(worker_puzzle.fragments)))
+	last_col_index = None
+	for (col_index, frag_index) in moves:
+		columns.push(col_index, frag_index, worker_puzzle.edges[frag_index])
+		all_pieces.remove(frag_index)
+		last_col_index = col_index
+	if len(all_pieces) == 0:
+		solution = columns.lines(worker_puzzle.fragments)
+		return solution if is_valid_solution(solution) else None
+	return next(solve_helper(columns, worker_puzzle, all_pieces, last_col_index), None)
+
 def solve_helper(
-		solution_cols: list[list[bytes]],
-		fragments: list[Fragment],
+		columns: Columns,
+		puzzle: Puzzle,
 		all_pieces: set[int],
-		left_edges: set[int],
-		right_edges: set[int],
-		top_edges: set[int],
 		last_col_index: int | None
-	) -> Iterator[list[str]]:
-	col_count = len(top_edges)
-	col_index = 0 if last_col_index is None else (last_col_index + 1) % col_count
-	col = solution_cols[col_index]
-	if len(col) > 0 and is_horiz_edge(col[-1]):
-		yield from solve_helper(
-			solution_cols,
-			fragments,
-			all_pieces,
-			left_edges, right_edges, top_edges,
-			col_index
-		)
+	) -> Iterator[list[list[bytes]]]:
+	# columns are changed in place and restored before returning
+	if stop_event is not None and stop_event.is_set():
 		return
-	horiz = (all_pieces & top_edges) if len(col) == 0 else (all_pieces - top_edges)
+	(col_index, matches) = next_slot(columns, puzzle, all_pieces, last_col_index)
+	for match_index in matches:
+		columns.push(col_index, match_index, puzzle.edges[match_index])
+		if len(all_pieces) == 1:
+			solution = columns.lines(puzzle.fragments)
+			if is_valid_solution(solution):
+				yield solution
+		else:
+			yield from solve_helper(columns, puzzle, all_pieces - {match_index}, col_index)
+		columns.pop(col_index, puzzle.edges[match_index])
+
+def next_slot(
+		columns: Columns,
+		puzzle: Puzzle,
+		all_pieces: set[int],
+		last_col_index: int | None
+	) -> tuple[int, list[int]]:
+	col_count = len(puzzle.top_edges)
+	col_index = 0 if last_col_index is None else (last_col_index + 1) % col_count
+	col = columns.placed[col_index]
+	if len(col) > 0 and puzzle.edges[col[-1]].is_bottom:
+		return next_slot(columns, puzzle, all_pieces, col_index)
+	horiz = (all_pieces & puzzle.top_edges) if len(col) == 0 else (all_pieces - puzzle.top_edges)
 	vert = (
-		(all_pieces & left_edges) if col_index == 0
-		else (all_pieces & right_edges) if col_index == col_count - 1
-		else (all_pieces - left_edges - right_edges)
+		(all_pieces & puzzle.left_edges) if col_index == 0
+		else (all_pieces & puzzle.right_edges) if col_index == col_count - 1
+		else (all_pieces - puzzle.left_edges - puzzle.right_edges)
 	)
 	matches = [
-		frag_index for frag_index in horiz.intersection(vert)
-		if fragment_matches(solution_cols, col_index, fragments[frag_index])
+		frag_index for frag_index in left_candidates(columns, col_index, puzzle, horiz.intersection(vert))
+		if fragment_matches(columns, col_index, puzzle.edges[frag_index])
 	]
 	if len(matches) <= 3:
-		for match_index in matches:
-			new_cols = [[line for line in copy_col] for copy_col in solution_cols]
-			new_cols[col_index].extend(fragments[match_index])
-			if len(all_pieces) == 1:
-				if is_valid_solution(new_cols):
-					yield new_cols
-			else:
-				yield from solve_helper(
-					new_cols,
-					fragments,
-					all_pieces - {match_index},
-					left_edges, right_edges, top_edges,
-					col_index
-				)
-	else:
-		yield from solve_helper(
-			solution_cols,
-			fragments,
-			all_pieces,
-			left_edges, right_edges, top_edges,
-			0
-		)
+		return (col_index, matches)
+	return next_slot(columns, puzzle, all_pieces, 0)
+
+def left_candidates(columns: Columns, col_index: int, puzzle: Puzzle, candidates: set[int]) -> Iterator[int]:
+	row_index = len(columns.starts[col_index])
+	left_ends = columns.ends[col_index - 1] if col_index > 0 else None
+	for height in puzzle.heights:
+		if left_ends is None:
+			left = (0,) * height
+		elif row_index + height <= len(left_ends):
+			left = tuple(left_ends[row_index:(row_index + height)])
+		else:
+			# The left column does not cover these rows yet, so any
+			# candidate of this height may fit
+			yield from (i for i in candidates if len(puzzle.fragments[i]) == height)
+			continue
+		yield from (i for i in puzzle.by_starts.get(left, []) if i in candidates)
 
 def is_valid_solution(solution_cols: list[list[bytes]]) -> bool:
 	if any(len(col) != len(solution_cols[0]) for col in solution_cols):
@@ -112,23 +223,31 @@ def x_coords(solution: list[str]) -> tuple[int, int]:
 				return (x, y)
 	raise ValueError("X not found")
 
-def fragment_matches(solution_cols: list[list[bytes]], col_index: int, fragment: Fragment) -> bool:
-	for (row_index, line) in enumerate(fragment, len(solution_cols[col_index])):
-		if (col_index - 1) >= 0 and row_index < len(solution_cols[col_index - 1]):
-			left_line = solution_cols[col_index - 1][row_index]
-			if missing_at_end(left_line) != extra_at_start(line):
+def fragment_matches(columns: Columns, col_index: int, edges: FragmentEdges) -> bool:
+	first_row = len(columns.starts[col_index])
+	if col_index > 0:
+		left_ends = columns.ends[col_index - 1]
+		for (row_index, start) in enumerate(edges.starts, first_row):
+			if row_index < len(left_ends) and left_ends[row_index] != start:
 				return False
-		if (col_index + 1) < len(solution_cols) and row_index < len(solution_cols[col_index + 1]):
-			right_line = solution_cols[col_index + 1][row_index]
-			if missing_at_end(line) != extra_at_start(right_line):
+	if col_index + 1 < len(columns.starts):
+		right_starts = columns.starts[col_index + 1]
+		for (row_index, end) in enumerate(edges.ends, first_row):
+			if row_index < len(right_starts) and end != right_starts[row_index]:
 				return False
 	return True
 
-def is_left_edge(fragment: Fragment) -> bool:
-	return all(extra_at_start(line) == 0 for line in fragment)
-
-def is_right_edge(fragment: Fragment) -> bool:
-	return all(missing_at_end(line) == 0 for line in fragment)
+def fragment_edges(fragment: Fragment) -> FragmentEdges:
+	starts = tuple(extra_at_start(line) for line in fragment)
+	ends = tuple(missing_at_end(line) for line in fragment)
+	return FragmentEdges(
+		starts,
+		ends,
+		all(start == 0 for start in starts),
+		all(end == 0 for end in ends),
+		is_horiz_edge(fragment[0]),
+		is_horiz_edge(fragment[-1])
+	)
 
 def is_horiz_edge(line: bytes) -> bool:
 	left = extra_at_start(line)
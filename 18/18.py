@@ -1,141 +1,147 @@
-from typing import Callable, Iterable, Iterator, TypeVar
-from collections import namedtuple
+from typing import Iterator
+import functools
 import re
+import bidi
 
 use_test = False
-EmbeddedValue = namedtuple("EmbeddedValue", ["value", "level"])
+show_cache_stats = False
+plan_cache_size = 4096
 operators = {
 	"+": lambda a, b: a + b,
 	"-": lambda a, b: a - b,
 	"*": lambda a, b: a * b,
 	"/": lambda a, b: a / b
 }
+precedence = {"+": 1, "-": 1, "*": 2, "/": 2}
+number_chars = frozenset("0123456789.")
+token_pattern = re.compile(r"[0-9.]+|\S")
+negate_step = "neg"
+ExprPlan = tuple[str | float, ...]
 
 def run(lines: Iterator[str]):
 	print(sum(
 		abs(eval_expr_rex(line) - eval_expr_lynx(line))
 		for line in lines
 	))
+	if show_cache_stats:
+		print_cache_stats()
 
 def eval_expr_rex(expr: str) -> int:
-	return eval_expr(re.sub(r"[^\d.+\-*/()]", "", expr))
+	return round(run_plan(rex_plan(normalize_expr(expr))))
 
 def eval_expr_lynx(expr: str) -> int:
-	rtl_fixed = parse_embedded(embed_rtl(expr), reverse_chars)
-	return eval_expr("".join(rtl_fixed))
+	return round(run_plan(lynx_plan(normalize_expr(expr))))
 
 def eval_expr(expr: str) -> int:
-	return round(parse_embedded(embed_expr(expr), evaluate_subexpr)[0])
-
-T = TypeVar("T")
-def parse_embedded(embedded: list[EmbeddedValue], transform: Callable[[list[str | T]], Iterable[T]]) -> list[T]:
-	embedded = list(embedded)
-	while (max_level := max(emb_value.level for emb_value in embedded)) > 0:
-		prev_level = 0
-		max_level_start = None
-		i = 0
-		while i < len(embedded):
-			level = embedded[i].level
-			if prev_level == max_level and level < prev_level:
-				i += replace_chunk(embedded, transform, max_level_start, i, max_level - 1)
-				max_level_start = None
-			if level == max_level and max_level_start is None:
-				max_level_start = i
-			prev_level = level
-			i += 1
-		if max_level_start is not None:
-			i += replace_chunk(embedded, transform, max_level_start, len(embedded), max_level - 1)
-	return [emb_value.value for emb_value in embedded]
-
-def replace_chunk(
-		embedded: list[EmbeddedValue],
-		transform: Callable[[list[str]], Iterable[str]],
-		start: int,
-		end: int,
-		new_level: int
-	) -> int:
-	transformed = list(transform([
-		emb_value.value
-		for emb_value in embedded[start:end]
-	]))
-	embedded[start:end] = (
-		EmbeddedValue(value=val, level=new_level)
-		for val in transformed
-	)
-	return len(transformed) - (end - start)
-
-def is_rtl(level: int) -> bool:
-	return level % 2 == 1
-
-def embed_expr(text: str) -> list[EmbeddedValue]:
-	return embed_levels(
-		f"({text})",
-		lambda current_level, char: (
-			(None, current_level + 1) if char == "("
-			else (None, current_level - 1) if char == ")"
-			else (None, current_level) if char.isspace()
-			else (current_level, current_level)
+	return round(run_plan(compile_expr(expr)))
+
+@functools.lru_cache(maxsize=plan_cache_size)
+def rex_plan(expr: str) -> ExprPlan:
+	return compile_expr(re.sub(r"[^\d.+\-*/()]", "", expr))
+
+@functools.lru_cache(maxsize=plan_cache_size)
+def lynx_plan(expr: str) -> ExprPlan:
+	return compile_expr(bidi.reorder_visual(expr))
+
+def normalize_expr(expr: str) -> str:
+	return " ".join(expr.split())
+
+def print_cache_stats():
+	for (name, plan_func) in [("rex", rex_plan), ("lynx", lynx_plan)]:
+		info = plan_func.cache_info()
+		lookups = info.hits + info.misses
+		print(
+			f"{name} plans: {info.hits}/{lookups} hits"
+			f" ({info.hits / lookups if lookups else 0:.1%}), {info.currsize} cached"
 		)
-	)
 
-def embed_rtl(text: str) -> list[EmbeddedValue]:
-	return embed_levels(text, embed_rtl_char)
-
-def embed_rtl_char(current_level: int, char: str) -> tuple[int | None, int]:
-	if char == "\N{RIGHT-TO-LEFT ISOLATE}":
-		return (
-			None,
-			current_level + 1 if not is_rtl(current_level) else current_level
-		)
-	elif char == "\N{LEFT-TO-RIGHT ISOLATE}":
-		return (
-			None,
-			current_level + 1 if is_rtl(current_level) else current_level
-		)
-	elif char == "\N{POP DIRECTIONAL ISOLATE}":
-		return (
-			None,
-			current_level - 1 if current_level > 0 else current_level
-		)
-	else:
-		return (
-			current_level + 1 if is_rtl(current_level) and char.isdigit() else current_level,
-			current_level
-		)
-
-def embed_levels(text: str, embed_func: Callable[[int, str], tuple[int | None, int]]) -> list[EmbeddedValue]:
-	leveled: list[EmbeddedValue] = []
-	level = 0
-	for char in text:
-		(embed_at, level) = embed_func(level, char)
-		if embed_at is not None:
-			leveled.append(EmbeddedValue(value=char, level=embed_at))
-	return leveled
-
-def reverse_chars(chars: list[str]) -> Iterable[str]:
-	return (flip_bracket(char) for char in reversed(chars))
-
-def evaluate_subexpr(subexpr: list[str | float]) -> Iterable[float]:
-	op_i = op_index(subexpr)
-	if op_i is None:
-		return "".join(subexpr)
-	return [operators[subexpr[op_i]](parse_number(subexpr[:op_i]), parse_number(subexpr[op_i + 1:]))]
-
-def parse_number(number: list[str | float]) -> float:
-	return float("".join(number)) if isinstance(number[0], str) else number[0]
-
-def op_index(subexpr: list[str | float]) -> int | None:
-	for (i, value) in enumerate(subexpr):
-		if value in operators and not (value == "-" and i == 0):
-			return i
-	return None
-
-def flip_bracket(char: str) -> str:
-	return (
-		")" if char == "("
-		else "(" if char == ")"
-		else char
-	)
+def tokenize_expr(expr: str) -> Iterator[str | float]:
+	# Whitespace is ignored entirely, so digits separated by spaces form one number
+	for match in token_pattern.finditer("".join(expr.split())):
+		token = match.group()
+		yield float(token) if token[0] in number_chars else token
+
+def compile_expr(expr: str) -> ExprPlan:
+	plan: list[str | float] = []
+	stack: list[GroupState] = []
+	group = GroupState(plan)
+	for token in tokenize_expr(expr):
+		if isinstance(token, float):
+			group.add_literal(token)
+		elif token == "(":
+			stack.append(group)
+			group = GroupState(plan)
+		elif token == ")":
+			if not stack:
+				raise ValueError("Unbalanced closing bracket")
+			group.finish()
+			group = stack.pop()
+			group.add_group()
+		elif token in operators:
+			group.add_operator(token)
+		else:
+			raise ValueError(f"Unexpected character {token!r}")
+	if stack:
+		raise ValueError("Unbalanced opening bracket")
+	group.finish()
+	return tuple(plan)
+
+def run_plan(plan: ExprPlan) -> float:
+	stack: list[float] = []
+	for step in plan:
+		if type(step) is float:
+			stack.append(step)
+		elif step == negate_step:
+			stack[-1] = -stack[-1]
+		else:
+			right = stack.pop()
+			stack[-1] = operators[step](stack[-1], right)
+	return stack[-1]
+
+class GroupState:
+	__slots__ = ("plan", "pending", "expects_operand", "sign")
+
+	def __init__(self, plan: list[str | float]):
+		self.plan = plan
+		self.pending: list[str] = []
+		self.expects_operand = True
+		self.sign = 1
+
+	def add_literal(self, value: float):
+		self.__check_operand()
+		self.plan.append(value * self.sign)
+		self.__close_operand()
+
+	def add_group(self):
+		self.__check_operand()
+		if self.sign < 0:
+			self.plan.append(negate_step)
+		self.__close_operand()
+
+	def add_operator(self, operator: str):
+		if not self.expects_operand:
+			while self.pending and precedence[self.pending[-1]] >= precedence[operator]:
+				self.plan.append(self.pending.pop())
+			self.pending.append(operator)
+			self.expects_operand = True
+		elif operator == "-":
+			self.sign = -self.sign
+		else:
+			raise ValueError(f"Missing operand before {operator}")
+
+	def finish(self):
+		if self.expects_operand:
+			raise ValueError("Missing operand")
+		while self.pending:
+			self.plan.append(self.pending.pop())
+
+	def __check_operand(self):
+		if not self.expects_operand:
+			raise ValueError("Missing operator")
+
+	def __close_operand(self):
+		self.sign = 1
+		self.expects_operand = False
 
 #region Common code
 if __name__ == "__main__":
@@ -0,0 +1,55 @@
+from array import array
+from collections.abc import Sequence
+
+right_to_left_isolate = "\N{RIGHT-TO-LEFT ISOLATE}"
+left_to_right_isolate = "\N{LEFT-TO-RIGHT ISOLATE}"
+pop_directional_isolate = "\N{POP DIRECTIONAL ISOLATE}"
+max_depth = 125
+mirrored_chars = str.maketrans("()[]{}<>", ")(][}{><")
+
+def resolve_levels(text: str, base_level: int = 0) -> tuple[str, array]:
+	chars: list[str] = []
+	levels = array("B")
+	stack: list[int] = []
+	overflow = 0
+	level = base_level
+	for char in text:
+		if char == right_to_left_isolate or char == left_to_right_isolate:
+			next_level = (level + 1) | 1 if char == right_to_left_isolate else (level + 2) & ~1
+			if next_level <= max_depth and overflow == 0:
+				stack.append(level)
+				level = next_level
+			else:
+				overflow += 1
+		elif char == pop_directional_isolate:
+			if overflow > 0:
+				overflow -= 1
+			elif stack:
+				level = stack.pop()
+		else:
+			chars.append(char)
+			levels.append(level + 1 if level & 1 and char.isdigit() else level)
+	return ("".join(chars), levels)
+
+def visual_order(levels: Sequence[int]) -> list[int]:
+	order = list(range(len(levels)))
+	if not levels:
+		return order
+	for level in range(max(levels), (min(levels) | 1) - 1, -1):
+		i = 0
+		while i < len(levels):
+			if levels[i] < level:
+				i += 1
+				continue
+			start = i
+			while i < len(levels) and levels[i] >= level:
+				i += 1
+			order[start:i] = reversed(order[start:i])
+	return order
+
+def reorder_visual(text: str, base_level: int = 0) -> str:
+	(chars, levels) = resolve_levels(text, base_level)
+	return "".join(
+		chars[i].translate(mirrored_chars) if levels[i] & 1 else chars[i]
+		for i in visual_order(levels)
+	)
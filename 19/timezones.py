@@ -1,10 +1,14 @@
 import datetime
+import hashlib
 import os
+import pickle
 import re
 from collections import namedtuple
 from typing import Iterator, Literal, Self, TypeVar
 
 data_root = "C:\\Users\\Ira\\Code\\zones"
+use_compiled_cache = True
+compiled_magic = b"TZC1"
 data_files = [
 	"africa", "antarctica", "asia", "australasia",
 	"backward", "backzone", "etcetera", "europe",
@@ -374,6 +378,53 @@ class TimeZoneData(object):
 			
 
 def load_tz_data(version: str) -> TimeZoneData:
+	if not use_compiled_cache:
+		return parse_tz_data(version)
+	digest = source_digest(version)
+	compiled_path = os.path.join(data_root, "compiled", f"{version}.tzc")
+	if (data := read_compiled(compiled_path, digest)) is not None:
+		return data
+	data = parse_tz_data(version)
+	write_compiled(compiled_path, digest, data)
+	return data
+
+def source_digest(version: str) -> bytes:
+	hasher = hashlib.sha256()
+	with open(__file__, "rb") as file_in:
+		hasher.update(hashlib.file_digest(file_in, "sha256").digest())
+	for filename in data_files:
+		with open(os.path.join(data_root, version, filename), "rb") as file_in:
+			hasher.update(filename.encode())
+			hasher.update(hashlib.file_digest(file_in, "sha256").digest())
+	return hasher.digest()
+
+def read_compiled(path: str, digest: bytes) -> TimeZoneData | None:
+	header = compiled_magic + digest
+	try:
+		with open(path, "rb") as file_in:
+			if file_in.read(len(header)) != header:
+				return None
+			data = pickle.load(file_in)
+	except Exception:
+		return None
+	return data if isinstance(data, TimeZoneData) else None
+
+def write_compiled(path: str, digest: bytes, data: TimeZoneData):
+	# The compiled file only speeds up later runs, so failing to write it is not an error
+	temp_path = f"{path}.{os.getpid()}.tmp"
+	try:
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(temp_path, "wb") as file_out:
+			file_out.write(compiled_magic + digest)
+			pickle.dump(data, file_out, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(temp_path, path)
+	except (OSError, pickle.PicklingError):
+		try:
+			os.remove(temp_path)
+		except OSError:
+			pass
+
+def parse_tz_data(version: str) -> TimeZoneData:
 	zones: list[ZoneLine] = []
 	rules: list[RuleLine] = []
 	links: list[LinkLine] = []